@@ -20,18 +20,46 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import sys
 import os
-import socketserver
 import ctypes
 import json
+import contextlib
+import functools
 import http.server
 import logging
 import logging.handlers
-from datetime import datetime
-from typing import Dict, List, Any, Union
+import re
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Iterable, Iterator, List, Any, Tuple, Union
+
+# orjsonが利用可能ならJSONのシリアライズに使用する（無ければ標準のjsonで代替）
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 PORT = 8000
 APP_VERSION = "1.0.0"
 
+# 受け付けるリクエストボディの最大サイズ（バイト）
+MAX_BODY_SIZE = 32 * 1024 * 1024
+
+# 検出パラメータの解析結果をキャッシュするrectの最大サイズ（バイト）
+RECT_CACHE_MAX_SIZE = 64 * 1024
+
+# バッチ推論の設定
+BATCH_MAX_SIZE = 8        # 1回の推論にまとめる最大リクエスト数
+BATCH_MAX_WAIT = 0.005    # 処理中の他のリクエストを待つ最大時間（秒）
+
+# chunked転送で1回に書き込む最大サイズ（バイト）
+CHUNK_WRITE_SIZE = 64 * 1024
+
+# 同時に処理するリクエストの最大数（受信バッファのメモリ使用量の上限）
+# CPU数に合わせるが、バッチ推論を埋められるよう BATCH_MAX_SIZE 以上とする
+MAX_CONCURRENT_REQUESTS = max(BATCH_MAX_SIZE, min(os.cpu_count() or 1, 16))
+
 # ログの設定
 def setup_logging():
     """ログの設定を行う"""
@@ -89,36 +117,100 @@ else:
 
 logger.info(f"Library path set to: {lib_path}")
 
-# 重要な依存ライブラリを事前にロード
-import ctypes
-try:
-    # OpenCVの主要ライブラリを事前ロード
-    ctypes.CDLL(os.path.join(lib_path, "libopencv_core.so.411"), mode=ctypes.RTLD_GLOBAL)
-    ctypes.CDLL(os.path.join(lib_path, "libopencv_imgproc.so.411"), mode=ctypes.RTLD_GLOBAL)
-    ctypes.CDLL(os.path.join(lib_path, "libopencv_imgcodecs.so.411"), mode=ctypes.RTLD_GLOBAL)
-    ctypes.CDLL(os.path.join(lib_path, "libopencv_highgui.so.411"), mode=ctypes.RTLD_GLOBAL)
-    ctypes.CDLL(os.path.join(lib_path, "libopencv_dnn.so.411"), mode=ctypes.RTLD_GLOBAL)
-    logger.info("✓ 依存ライブラリの事前ロード完了")
-except OSError as e:
-    logger.warning(f"依存ライブラリの事前ロードに失敗: {e}")
-    logger.info("LD_LIBRARY_PATHでの解決を試行します...")
+# PersonCounterModule.soが依存するライブラリ（./libから事前ロードする）
+PRELOAD_LIBRARIES = (
+    "libopencv_core.so.411",
+    "libopencv_imgproc.so.411",
+    "libopencv_imgcodecs.so.411",
+    "libopencv_highgui.so.411",
+    "libopencv_dnn.so.411",
+)
+
+def preload_libraries(lib_dir: str):
+    """依存ライブラリを事前にロードする（シンボルはロード時に全て解決する）"""
+    mode = os.RTLD_NOW | os.RTLD_GLOBAL
+    for name in PRELOAD_LIBRARIES:
+        ctypes.CDLL(os.path.join(lib_dir, name), mode=mode)
 
 try:
     # C++で定義したクラスを含むモジュールのインポート
-    from PersonCounterModule import Rect, OBJPos, Thresholds, PersonCounter
+    # RPATH等で依存ライブラリが解決できる場合は事前ロードを行わない
+    from PersonCounterModule import RectList, OBJPosList, Thresholds, PersonCounter
     logger.info("✓ PersonCounterModule のインポート完了")
 except ImportError as e:
-    logger.error(f"モジュールのimportに失敗しました: {e}")
-    sys.exit(1)
+    logger.info(f"依存ライブラリを事前ロードして再試行します: {e}")
+    try:
+        # OpenCVの主要ライブラリを事前ロード
+        preload_libraries(lib_path)
+        logger.info("✓ 依存ライブラリの事前ロード完了")
+    except OSError as e:
+        logger.warning(f"依存ライブラリの事前ロードに失敗: {e}")
+        logger.info("LD_LIBRARY_PATHでの解決を試行します...")
+
+    try:
+        from PersonCounterModule import RectList, OBJPosList, Thresholds, PersonCounter
+        logger.info("✓ PersonCounterModule のインポート完了")
+    except ImportError as e:
+        logger.error(f"モジュールのimportに失敗しました: {e}")
+        sys.exit(1)
+
+class PayloadTooLargeError(Exception):
+    """リクエストボディが上限（MAX_BODY_SIZE）を超えている"""
+
+# multipart/form-data の各パートから name を取り出す
+_PART_NAME_RE = re.compile(rb';\s*name="([^"]*)"')
+
+def read_request_body(rfile, content_length: int) -> bytearray:
+    """リクエストボディを事前確保したバッファに読み込む"""
+    body = bytearray(content_length)
+    view = memoryview(body)
+    pos = 0
+    while pos < content_length:
+        n = rfile.readinto(view[pos:])
+        if not n:
+            raise ValueError("Incomplete request body")
+        pos += n
+    return body
+
+def parse_multipart(body: bytearray, boundary: bytes) -> Dict[str, memoryview]:
+    """
+    multipart/form-data をパースする
+    各パートの内容はコピーせず、bodyへのmemoryviewとして返す
+    """
+    delimiter = b"--" + boundary
+    view = memoryview(body)
+    parts: Dict[str, memoryview] = {}
+
+    pos = body.find(delimiter)
+    if pos < 0:
+        raise ValueError("Malformed multipart body")
+    pos += len(delimiter)
+
+    while body[pos:pos + 2] != b"--":
+        header_end = body.find(b"\r\n\r\n", pos)
+        if header_end < 0:
+            raise ValueError("Malformed multipart body")
+        content_start = header_end + 4
+        content_end = body.find(b"\r\n" + delimiter, content_start)
+        if content_end < 0:
+            raise ValueError("Malformed multipart body")
+
+        match = _PART_NAME_RE.search(body, pos, header_end)
+        if match:
+            parts[match.group(1).decode("utf-8")] = view[content_start:content_end]
+
+        pos = content_end + 2 + len(delimiter)
+
+    return parts
 
 # サーバー用の型定義クラス（C++バインディングとは別）
 class Area:
-    def __init__(self, id: int, name: str, vertexs: List[OBJPos]):
+    def __init__(self, id: int, name: str, vertexs: OBJPosList):
         self.id = id
         self.name = name
         self.vertexs = vertexs
 
-    def to_objpos_list(self) -> List[OBJPos]:
+    def to_objpos_list(self) -> OBJPosList:
         """頂点リストをC++のOBJPosリストに変換"""
         return self.vertexs
 
@@ -132,19 +224,20 @@ class DetectionParams:
 # レスポンス用の型クラス
 class AreaResult:
     """エリア毎の検出結果"""
-    def __init__(self, area_id: int, name: str, count: int, results: List[Rect]):
+    def __init__(self, area_id: int, name: str, count: int, results: RectList):
         self.id = area_id
         self.name = name
         self.count = count
         self.results = results
 
-    def to_dict(self) -> Dict[str, Any]:
-        return {
-            "id": self.id,
-            "name": self.name,
-            "count": self.count,
-            "results": [result.to_dict() for result in self.results]
-        }
+    def to_json(self) -> bytes:
+        # 検出矩形はC++側でまとめてJSON化したものをそのまま埋め込む
+        return b'{"id":%s,"name":%s,"count":%d,"results":%s}' % (
+            json_dumps(self.id),
+            json_dumps(self.name),
+            self.count,
+            self.results.to_json()
+        )
 
 class PersonCountResponse:
     """レスポンス全体の構造"""
@@ -152,148 +245,344 @@ class PersonCountResponse:
         self.error = error
         self.area_results = area_results
 
-    def to_dict(self) -> Dict[str, Any]:
-        return {
-            "error": self.error,
-            "areas": [area_result.to_dict() for area_result in self.area_results]
-        }
+    def iter_json(self) -> Iterator[bytes]:
+        """レスポンスのJSONをエリア単位に分割して順に生成する"""
+        yield b'{"error":%s,"areas":[' % json_dumps(self.error)
+        for i, area_result in enumerate(self.area_results):
+            yield area_result.to_json() if i == 0 else b"," + area_result.to_json()
+        yield b"]}"
+
+def json_dumps(obj: Any) -> bytes:
+    """オブジェクトをJSONのバイト列に変換する"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
+def json_loads(data: Union[bytes, bytearray, memoryview]) -> Any:
+    """JSONのバイト列をデコードする（文字列への変換は行わない）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(bytes(data))
+
+# 固定のレスポンスボディは起動時にエンコードしておく
+NOT_FOUND_BODY = json_dumps({"error": "Not Found"})
+BAD_REQUEST_TEMPLATE = b'{"error":%s}'
+INTERNAL_ERROR_TEMPLATE = b'{"error":"Internal Server Error","message":%s}'
+
+def parse_detection_params(data: Dict[str, Any]) -> DetectionParams:
+    """
+    検出パラメータをパースする
+    {
+        "modelConfidenceThreshold": 0.2,
+        "modelScoreThreshold": 0.2,
+        "modelNMSThreshold": 0.2,
+        "areas": [
+            { "id": 1, "name": "Area1", "vertexs": [ { "x": 10, "y": 20 }, ...]},
+        ],
+    }
+    """
+    # ループ内でのグローバル参照を避けるためローカル名に束縛
+    _Area = Area
+    _from_vertexs = OBJPosList.from_vertexs
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+
+    if debug_enabled:
+        logger.debug("パラメータ解析開始: %s", data)
+
+    # 必須フィールドのチェック
+    required_fields = ["areas", "modelConfidenceThreshold", "modelScoreThreshold", "modelNMSThreshold"]
+    for field in required_fields:
+        if field not in data:
+            logger.error("必須フィールド '%s' が見つかりません", field)
+            raise ValueError(f"{field} field is required")
+
+    areas_data = data["areas"]
+
+    # バリデーション
+    if not isinstance(areas_data, list):
+        logger.error("areas は配列である必要があります")
+        raise ValueError("areas must be an array")
+
+    # 個別の型チェックは行わず、不正な構造はKeyError/TypeErrorとして検出する
+    # 頂点の検証と変換はC++側（OBJPosList.from_vertexs）で行う
+    try:
+        areas = [
+            _Area(a["id"], a["name"], _from_vertexs(a["vertexs"]))
+            for a in areas_data
+        ]
+    except KeyError as e:
+        logger.error("エリアに必須フィールド %s が不足しています", e)
+        raise ValueError(f"Area field {e} is required") from e
+    except TypeError as e:
+        logger.error("エリアの形式が不正です: %s", e)
+        raise ValueError("Each area must be an object with a vertexs array of x, y coordinates") from e
+
+    if debug_enabled:
+        for area in areas:
+            logger.debug("エリア %s (%s) を追加: %d 個の頂点", area.id, area.name, len(area.vertexs))
+
+    logger.info("パラメータ解析完了: %d エリア", len(areas))
+    return DetectionParams(
+        thresholds=Thresholds(
+            data["modelConfidenceThreshold"],
+            data["modelScoreThreshold"],
+            data["modelNMSThreshold"]
+        ),
+        areas=areas
+    )
+
+def decode_detection_params(rect_json: Union[bytes, memoryview]) -> DetectionParams:
+    """rectのJSONから検出パラメータを生成する"""
+    try:
+        rect_data = json_loads(rect_json)
+    except json.JSONDecodeError as e:
+        logger.error("JSONデコードエラー: %s", e)
+        raise ValueError("Invalid rect JSON")
+
+    return parse_detection_params(rect_data)
+
+@functools.lru_cache(maxsize=128)
+def load_detection_params(rect_json: bytes) -> DetectionParams:
+    """
+    rectのJSONから検出パラメータを生成する（キャッシュ付き）
+    クライアントは同じエリア定義を繰り返し送るため、JSONのバイト列をキーに
+    解析結果（C++側の多角形を含む）をキャッシュする
+    キーとして保持されるため、RECT_CACHE_MAX_SIZE 以下のJSONのみを渡す
+    """
+    return decode_detection_params(rect_json)
+
+class BatchScheduler:
+    """
+    同時に届いたリクエストをまとめてdetectHeadsBatchで推論する
+    PersonCounterは内部バッファを再利用するため、スケジューラのスレッドからのみ呼び出す
+    """
+    def __init__(self, counter: PersonCounter,
+                 max_batch_size: int = BATCH_MAX_SIZE,
+                 max_wait: float = BATCH_MAX_WAIT):
+        self.counter = counter
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue: "queue.Queue[Tuple[memoryview, List[OBJPosList], Thresholds, Future]]" = queue.Queue()
+        # 処理中のリクエスト数（他に処理中のリクエストがある場合のみ後続を待つ）
+        self.active_requests = 0
+        self.active_lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name="BatchScheduler", daemon=True)
+        self.thread.start()
+
+    @contextlib.contextmanager
+    def track_request(self):
+        """リクエストの処理中であることを記録する"""
+        with self.active_lock:
+            self.active_requests += 1
+        try:
+            yield
+        finally:
+            with self.active_lock:
+                self.active_requests -= 1
+
+    def submit(self, image_data: memoryview, vertices_list: List[OBJPosList],
+               thresholds: Thresholds) -> Future:
+        """検出要求をキューに追加し、結果（エリア毎のRectList）を受け取るFutureを返す"""
+        future: Future = Future()
+        self.queue.put((image_data, vertices_list, thresholds, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            # 推論中に届いたリクエストは待たずにまとめる
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            # 受信・解析中の他のリクエストがある場合のみ、後続を待つ
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size and self.active_requests > len(batch):
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                self._process(batch)
+            except Exception as e:
+                # 想定外の例外でもスレッドを止めず、待機中のリクエストを必ず完了させる
+                logger.error("バッチ処理中に予期しないエラーが発生しました: %s", e, exc_info=True)
+                for item in batch:
+                    if not item[3].done():
+                        item[3].set_exception(RuntimeError(f"Batch processing failed: {e}"))
+
+    def _process(self, batch: List[Tuple[memoryview, List[OBJPosList], Thresholds, Future]]):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("バッチ推論開始: %d リクエスト", len(batch))
+        try:
+            results = self.counter.detectHeadsBatch(
+                [item[0] for item in batch],
+                [item[1] for item in batch],
+                [item[2] for item in batch]
+            )
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][3].set_exception(e)
+                return
+            # 失敗したリクエストだけがエラーになるよう1件ずつ再実行する
+            logger.warning("バッチ推論に失敗したため個別に再実行します: %s", e)
+            for item in batch:
+                self._process([item])
+            return
+
+        for item, result in zip(batch, results):
+            item[3].set_result(result)
 
 # インスタンス生成とメソッド呼び出し
 obj: PersonCounter = PersonCounter()
+scheduler = BatchScheduler(obj)
 logger.info("✓ PersonCounter インスタンス生成完了")
 
+# 同時処理数の制限（上限を超えたリクエストはボディを受信する前に待機する）
+request_slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+
 class Handler(http.server.SimpleHTTPRequestHandler):
+    # HTTP/1.1のkeep-aliveで接続を再利用し、TCP_NODELAYで小さな応答の遅延を防ぐ
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    # アイドル状態の接続がスレッドを占有し続けないようにする（秒）
+    timeout = 30
+    # レスポンスのステータス行を送信済みかどうか
+    response_started = False
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
     def log_message(self, format, *args):
         """HTTPサーバーのログメッセージをカスタムロガーにリダイレクト"""
-        logger.info(f"{self.client_address[0]} - {format % args}")
-
-    def parse_detection_params(self, data: Dict[str, Any]) -> DetectionParams:
-        """
-        検出パラメータをパースする
-        {
-            "modelConfidenceThreshold": 0.2,
-            "modelScoreThreshold": 0.2,
-            "modelNMSThreshold": 0.2,
-            "areas": [
-                { "id": 1, "name": "Area1", "vertexs": [ { "x": 10, "y": 20 }, ...]},
-            ],
-        }
-        """
-        logger.debug(f"パラメータ解析開始: {data}")
-
-        # 必須フィールドのチェック
-        required_fields = ["areas", "modelConfidenceThreshold", "modelScoreThreshold", "modelNMSThreshold"]
-        for field in required_fields:
-            if field not in data:
-                logger.error(f"必須フィールド '{field}' が見つかりません")
-                raise ValueError(f"{field} field is required")
-
-        areas_data = data["areas"]
-
-        # バリデーション
-        if not isinstance(areas_data, list):
-            logger.error("areas は配列である必要があります")
-            raise ValueError("areas must be an array")
-
-        areas = []
-        for i, area_data in enumerate(areas_data):
-            if not isinstance(area_data, dict):
-                logger.error(f"エリア {i} はオブジェクトである必要があります")
-                raise ValueError("Each area must be an object")
-            if "id" not in area_data or "name" not in area_data or "vertexs" not in area_data:
-                logger.error(f"エリア {i} に必須フィールドが不足しています")
-                raise ValueError("Area must have id, name, and vertexs fields")
-            if not isinstance(area_data["vertexs"], list):
-                logger.error(f"エリア {i} の vertexs は配列である必要があります")
-                raise ValueError("vertexs must be an array")
-
-            vertexs: List[OBJPos] = []
-            for j, vertex_data in enumerate(area_data["vertexs"]):
-                if not isinstance(vertex_data, dict) or "x" not in vertex_data or "y" not in vertex_data:
-                    logger.error(f"エリア {i} の頂点 {j} に座標が不足しています")
-                    raise ValueError("Each vertex must have x and y coordinates")
-                vertexs.append(OBJPos(vertex_data["x"], vertex_data["y"]))
-
-            areas.append(Area(area_data["id"], area_data["name"], vertexs))
-            logger.debug(f"エリア {area_data['id']} ({area_data['name']}) を追加: {len(vertexs)} 個の頂点")
-
-        logger.info(f"パラメータ解析完了: {len(areas)} エリア")
-        return DetectionParams(
-            thresholds=Thresholds(
-                data["modelConfidenceThreshold"],
-                data["modelScoreThreshold"],
-                data["modelNMSThreshold"]
-            ),
-            areas=areas
-        )
+        logger.info("%s - " + format, self.client_address[0], *args)
 
-    def do_GET(self):
-        logger.info(f"GET request from {self.client_address[0]}: {self.path}")
-        self.send_response(404)
+    def send_json(self, status: int, body: bytes):
+        """JSONのレスポンスを送信する"""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Connection", "close" if self.close_connection else "keep-alive")
+        self.end_headers()
+        self.response_started = True
+        self.wfile.write(body)
+
+    def send_json_chunked(self, status: int, chunks: Iterable[bytes]):
+        """JSONのレスポンスを分割して送信する（HTTP/1.1ではchunked転送）"""
+        if self.request_version != "HTTP/1.1":
+            # HTTP/1.0のクライアントはchunked転送に対応しないため一括で送信
+            self.send_json(status, b"".join(chunks))
+            return
+
+        self.send_response(status)
         self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Connection", "close" if self.close_connection else "keep-alive")
         self.end_headers()
-        self.wfile.write(json.dumps({"error": "Not Found"}).encode("utf-8"))
+        self.response_started = True
+
+        # wfileはバッファリングされないため、小さな断片はまとめてから書き込む
+        pending: List[bytes] = []
+        pending_size = 0
+        for chunk in chunks:
+            pending.append(chunk)
+            pending_size += len(chunk)
+            if pending_size >= CHUNK_WRITE_SIZE:
+                self.wfile.write(b"%x\r\n%s\r\n" % (pending_size, b"".join(pending)))
+                pending.clear()
+                pending_size = 0
+        # 残りの断片と終端のチャンクは1回で書き込む
+        last = b"%x\r\n%s\r\n" % (pending_size, b"".join(pending)) if pending_size else b""
+        self.wfile.write(last + b"0\r\n\r\n")
+
+    def send_error_json(self, status: int, body: bytes):
+        """エラーのレスポンスを送信し、接続を閉じる"""
+        # リクエストボディを読み切っていない可能性があるため接続を閉じる
+        self.close_connection = True
+        if self.response_started:
+            # 送信中のレスポンスの途中にエラーのレスポンスを書き込まない
+            return
+        self.send_json(status, body)
+
+    def do_GET(self):
+        logger.info("GET request from %s: %s", self.client_address[0], self.path)
+        self.send_json(404, NOT_FOUND_BODY)
 
     def handle_person_count(self):
-        start_time = datetime.now()
-        logger.info(f"Person count request started from {self.client_address[0]}")
+        start_time = time.perf_counter_ns()
+        logger.info("Person count request started from %s", self.client_address[0])
 
         ctype = self.headers.get('Content-Type')
         if not (ctype and ctype.startswith('multipart/form-data')):
             logger.error("Invalid Content-Type, expected multipart/form-data")
             raise ValueError("Bad Request")
 
-        import cgi
-        form = cgi.FieldStorage(
-            fp=self.rfile,
-            headers=self.headers,
-            environ={'REQUEST_METHOD': 'POST', 'CONTENT_TYPE': ctype}
-        )
+        boundary = self.headers.get_param('boundary')
+        if not boundary:
+            logger.error("multipart boundary が見つかりません")
+            raise ValueError("Missing multipart boundary")
+
+        content_length = int(self.headers.get('Content-Length', 0))
+        if content_length <= 0:
+            logger.error("Content-Length が指定されていません")
+            raise ValueError("Missing Content-Length")
+        if content_length > MAX_BODY_SIZE:
+            # バッファを確保する前に拒否する
+            logger.error("リクエストボディが大きすぎます: %d bytes", content_length)
+            raise PayloadTooLargeError(f"Request body too large (limit: {MAX_BODY_SIZE} bytes)")
+
+        body = read_request_body(self.rfile, content_length)
+        form = parse_multipart(body, boundary.encode("latin-1"))
 
         # 画像データ
         if 'image' in form:
-            image_data = form['image'].file.read()
-            logger.info(f"画像データ受信: {len(image_data)} bytes")
+            # 受信バッファへのmemoryviewをコピーせずにC++へ渡す
+            image_data = form['image']
+            logger.info("画像データ受信: %d bytes", len(image_data))
         else:
             logger.error("画像データが見つかりません")
             raise ValueError("Missing image data")
 
         # JSONデータ
         if 'rect' in form:
-            rect_json = form['rect'].value
-            logger.debug(f"検出パラメータ受信: {rect_json}")
+            rect_json = form['rect']
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("検出パラメータ受信: %s", str(rect_json, 'utf-8', 'replace'))
         else:
             logger.error("検出パラメータが見つかりません")
             raise ValueError("Missing rect data")
 
-        try:
-            rect_data = json.loads(rect_json)
-        except json.JSONDecodeError as e:
-            logger.error(f"JSONデコードエラー: {e}")
-            raise ValueError("Invalid rect JSON")
-
-        # パラメータの解析
-        params = self.parse_detection_params(rect_data)
+        # パラメータの解析（同じJSONは前回の解析結果を再利用）
+        # 大きなJSONはキャッシュのキーとしてメモリに残さないよう毎回解析する
+        if len(rect_json) <= RECT_CACHE_MAX_SIZE:
+            params = load_detection_params(bytes(rect_json))
+        else:
+            params = decode_detection_params(rect_json)
 
         # 各エリアで頭部検出実行
         area_results: List[AreaResult] = []
         total_detections = 0
 
         if params.areas:
-            # 指定されたエリア毎に検出
-            for area in params.areas:
-                logger.info(f"エリア {area.id} ({area.name}) の検出開始")
-                area_start_time = datetime.now()
+            # 全エリアをまとめて検出（同時に届いた他のリクエストと1回の推論にまとめる）
+            logger.info("%d エリアの検出開始", len(params.areas))
+            detect_start_time = time.perf_counter_ns()
 
-                detection_rects: List[Rect] = obj.detectHeads(image_data, area.vertexs, params.thresholds)
+            future = scheduler.submit(
+                image_data,
+                [area.vertexs for area in params.areas],
+                params.thresholds
+            )
+            detection_rects_list: List[RectList] = future.result()
 
-                area_end_time = datetime.now()
-                area_duration = (area_end_time - area_start_time).total_seconds()
+            detect_duration = (time.perf_counter_ns() - detect_start_time) / 1e9
 
-                logger.info(f"エリア {area.id} ({area.name}) の検出完了: {len(detection_rects)} 個検出 ({area_duration:.3f}秒)")
+            for area, detection_rects in zip(params.areas, detection_rects_list):
+                logger.info("エリア %s (%s) の検出完了: %d 個検出", area.id, area.name, len(detection_rects))
                 total_detections += len(detection_rects)
 
                 # C++のRectをそのまま使用
@@ -304,52 +593,48 @@ class Handler(http.server.SimpleHTTPRequestHandler):
                     results=detection_rects
                 ))
 
+            logger.info("%d エリアの検出完了 (%.3f秒)", len(params.areas), detect_duration)
+
         # レスポンス作成
         response = PersonCountResponse(
             error="OK",
             area_results=area_results
         )
 
-        end_time = datetime.now()
-        duration = (end_time - start_time).total_seconds()
-        logger.info(f"Person count request completed: {total_detections} 個検出, 処理時間: {duration:.3f}秒")
+        duration = (time.perf_counter_ns() - start_time) / 1e9
+        logger.info("Person count request completed: %d 個検出, 処理時間: %.3f秒", total_detections, duration)
 
         # レスポンス送信
-        self.send_response(200)
-        self.send_header("Content-Type", "application/json")
-        self.end_headers()
-        self.wfile.write(json.dumps(response.to_dict()).encode("utf-8"))
+        self.send_json_chunked(200, response.iter_json())
 
     def do_POST(self):
+        self.response_started = False
         try:
             if self.path.startswith('/person_count'):
-                self.handle_person_count()
+                with request_slots, scheduler.track_request():
+                    self.handle_person_count()
             else:
-                logger.warning(f"Unknown POST endpoint: {self.path}")
+                logger.warning("Unknown POST endpoint: %s", self.path)
                 raise FileNotFoundError()
         except FileNotFoundError:
-            logger.error(f"404 Not Found: {self.path}")
-            self.send_response(404)
-            self.send_header("Content-Type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps({"error": "Not Found"}).encode("utf-8"))
+            logger.error("404 Not Found: %s", self.path)
+            self.send_error_json(404, NOT_FOUND_BODY)
+        except PayloadTooLargeError as e:
+            logger.error("413 Payload Too Large: %s", e)
+            self.send_error_json(413, BAD_REQUEST_TEMPLATE % json_dumps(str(e)))
         except ValueError as e:
-            logger.error(f"400 Bad Request: {e}")
-            self.send_response(400)
-            self.send_header("Content-Type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps({"error": str(e)}).encode("utf-8"))
+            logger.error("400 Bad Request: %s", e)
+            self.send_error_json(400, BAD_REQUEST_TEMPLATE % json_dumps(str(e)))
         except Exception as e:
-            logger.error(f"500 Internal Server Error: {e}", exc_info=True)
-            self.send_response(500)
-            self.send_header("Content-Type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps({"error": "Internal Server Error", "message": str(e)}).encode("utf-8"))
+            logger.error("500 Internal Server Error: %s", e, exc_info=True)
+            self.send_error_json(500, INTERNAL_ERROR_TEMPLATE % json_dumps(str(e)))
 
 if __name__ == "__main__":
     try:
         logger.info(f"Person Count Server Version {APP_VERSION}")
-        with socketserver.TCPServer(("", PORT), Handler) as httpd:
+        # リクエスト毎にスレッドを割り当て、受信・パース・応答を並行して処理する
+        # 同時に処理するリクエスト数は MAX_CONCURRENT_REQUESTS までに制限する
+        with http.server.ThreadingHTTPServer(("", PORT), Handler) as httpd:
             logger.info(f"Server starting on http://localhost:{PORT}")
             logger.info(f"Press Ctrl+C to stop the server")
             httpd.serve_forever()
@@ -19,23 +19,97 @@ Inference::Inference(const std::string &onnxModelPath,
 
 std::vector<Detection> Inference::runInference(const cv::Mat &input)
 {
-    cv::Mat modelInput = input;
-    int pad_x, pad_y;
-    float scale;
-    if (letterBoxForSquare && modelShape.width == modelShape.height) {
-        modelInput = formatToSquare(modelInput, &pad_x, &pad_y, &scale);
+    forwardBatch(std::vector<cv::Mat>{input});
+    return getDetections(0);
+}
+
+void Inference::forwardBatch(const std::vector<cv::Mat> &inputs)
+{
+    size_t n = inputs.size();
+    if (n > maxBatchSize) {
+        CV_Error(cv::Error::StsOutOfRange, "Too many images for a single batch");
+    }
+    if (squareImages.size() < n) {
+        squareImages.resize(n);
+    }
+    modelInputs.resize(n);
+    letterboxes.assign(n, Letterbox());
+    batchOutputs.resize(n);
+
+    for (size_t i = 0; i < n; ++i) {
+        modelInputs[i] = inputs[i];
+        if (letterBoxForSquare && modelShape.width == modelShape.height) {
+            Letterbox &lb = letterboxes[i];
+            formatToSquare(inputs[i], squareImages[i], &lb.pad_x, &lb.pad_y,
+                           &lb.scale);
+            modelInputs[i] = squareImages[i];
+        }
+    }
+
+    if (n > 1 && batchEnabled) {
+        try {
+            cv::dnn::blobFromImages(modelInputs, inputBlob, 1.0 / 255.0, modelShape,
+                                    cv::Scalar(), true, false);
+            net.setInput(inputBlob);
+            net.forward(outputs, net.getUnconnectedOutLayersNames());
+
+            if (outputs[0].dims == 3 && outputs[0].size[0] == static_cast<int>(n)) {
+                // 出力 (batchSize, shape[1], shape[2]) を画像毎の2次元として参照する
+                for (size_t i = 0; i < n; ++i) {
+                    batchOutputs[i] =
+                        cv::Mat(outputs[0].size[1], outputs[0].size[2], CV_32F,
+                                outputs[0].ptr<float>(static_cast<int>(i)));
+                }
+                return;
+            }
+
+            // バッチ次元が固定されたモデルは以降バッチ推論を行わない
+            spdlog::warn("Batch inference is not supported by the model "
+                         "(unexpected output shape), falling back to per-image "
+                         "inference.");
+            batchEnabled = false;
+        }
+        catch (const cv::Exception &e) {
+            // メモリ不足などバッチサイズに依存する失敗もあるため、この呼び出しのみ画像毎に推論する
+            spdlog::warn("Batch inference failed, falling back to per-image "
+                         "inference: {}",
+                         e.what());
+        }
+    }
+
+    if (fallbackOutputs.size() < n) {
+        fallbackOutputs.resize(n);
     }
+    for (size_t i = 0; i < n; ++i) {
+        cv::dnn::blobFromImage(modelInputs[i], inputBlob, 1.0 / 255.0, modelShape,
+                               cv::Scalar(), true, false);
+        net.setInput(inputBlob);
+        net.forward(outputs, net.getUnconnectedOutLayersNames());
+
+        cv::Mat output(outputs[0].size[1], outputs[0].size[2], CV_32F,
+                       outputs[0].ptr<float>());
+        if (n == 1) {
+            batchOutputs[i] = output;
+        }
+        else {
+            // 次の推論で出力が上書きされるため画像毎のバッファに退避
+            output.copyTo(fallbackOutputs[i]);
+            batchOutputs[i] = fallbackOutputs[i];
+        }
+    }
+}
 
-    cv::Mat blob;
-    cv::dnn::blobFromImage(modelInput, blob, 1.0 / 255.0, modelShape, cv::Scalar(),
-                           true, false);
-    net.setInput(blob);
+std::vector<Detection> Inference::getDetections(size_t index)
+{
+    const cv::Mat &rawOutput = batchOutputs[index];
+    int pad_x = letterboxes[index].pad_x;
+    int pad_y = letterboxes[index].pad_y;
+    float scale = letterboxes[index].scale;
 
-    std::vector<cv::Mat> outputs;
-    net.forward(outputs, net.getUnconnectedOutLayersNames());
+    cv::Mat output = rawOutput;
 
-    int rows = outputs[0].size[1];
-    int dimensions = outputs[0].size[2];
+    int rows = rawOutput.rows;
+    int dimensions = rawOutput.cols;
 
     bool yolov8 = false;
     // yolov5 has an output of shape (batchSize, 25200, 85) (Num classes +
@@ -44,13 +118,13 @@ std::vector<Detection> Inference::runInference(const cv::Mat &input)
     if (dimensions > rows) // Check if the shape[2] is more than shape[1] (yolov8)
     {
         yolov8 = true;
-        rows = outputs[0].size[2];
-        dimensions = outputs[0].size[1];
+        rows = rawOutput.cols;
+        dimensions = rawOutput.rows;
 
-        outputs[0] = outputs[0].reshape(1, dimensions);
-        cv::transpose(outputs[0], outputs[0]);
+        cv::transpose(rawOutput, transposedOutput);
+        output = transposedOutput;
     }
-    float *data = (float *)outputs[0].data;
+    float *data = (float *)output.data;
 
     std::vector<int> class_ids;
     std::vector<float> confidences;
@@ -173,8 +247,8 @@ void Inference::loadOnnxNetwork()
     }
 }
 
-cv::Mat Inference::formatToSquare(const cv::Mat &source, int *pad_x, int *pad_y,
-                                  float *scale)
+void Inference::formatToSquare(const cv::Mat &source, cv::Mat &result, int *pad_x,
+                               int *pad_y, float *scale)
 {
     int col = source.cols;
     int row = source.rows;
@@ -187,10 +261,9 @@ cv::Mat Inference::formatToSquare(const cv::Mat &source, int *pad_x, int *pad_y,
     *pad_x = (m_inputWidth - resized_w) / 2;
     *pad_y = (m_inputHeight - resized_h) / 2;
 
-    cv::Mat resized;
+    result.create(m_inputHeight, m_inputWidth, source.type());
+    result.setTo(cv::Scalar::all(0));
+    // パディング領域を除いた部分に直接リサイズする
+    cv::Mat resized = result(cv::Rect(*pad_x, *pad_y, resized_w, resized_h));
     cv::resize(source, resized, cv::Size(resized_w, resized_h));
-    cv::Mat result = cv::Mat::zeros(m_inputHeight, m_inputWidth, source.type());
-    resized.copyTo(result(cv::Rect(*pad_x, *pad_y, resized_w, resized_h)));
-    resized.release();
-    return result;
 }
@@ -30,6 +30,14 @@ class Inference {
               const bool &runWithCuda = true);
     std::vector<Detection> runInference(const cv::Mat &input);
 
+    // 1回の推論にまとめる最大画像数（入力blobと再利用バッファの上限）
+    static constexpr size_t maxBatchSize = 8;
+
+    // 複数画像をまとめて推論し、結果は getDetections で画像毎に取り出す
+    // inputs は maxBatchSize 枚以下とする
+    void forwardBatch(const std::vector<cv::Mat> &inputs);
+    std::vector<Detection> getDetections(size_t index);
+
     void setThresholds(float confidenceThreshold = 0.25,
                        float scoreThreshold = 0.45, float nmsThreshold = 0.50) {
         modelConfidenceThreshold = confidenceThreshold;
@@ -38,10 +46,17 @@ class Inference {
     }
 
    private:
+    // レターボックス変換のパラメータ（検出座標を元画像に戻すために使用）
+    struct Letterbox {
+        int pad_x{0};
+        int pad_y{0};
+        float scale{1.0f};
+    };
+
     void loadClassesFromFile();
     void loadOnnxNetwork();
-    cv::Mat formatToSquare(const cv::Mat &source, int *pad_x, int *pad_y,
-                           float *scale);
+    void formatToSquare(const cv::Mat &source, cv::Mat &result, int *pad_x,
+                        int *pad_y, float *scale);
 
     std::string modelPath{};
     std::string classesPath{};
@@ -56,8 +71,20 @@ class Inference {
     float modelNMSThreshold{0.50};
 
     bool letterBoxForSquare = true;
+    // モデルの出力がバッチに対応しない場合は false にして画像毎に推論する
+    bool batchEnabled = true;
 
     cv::dnn::Net net;
+
+    // 推論毎に再利用するバッファ（サイズが同じ間は再確保しない）
+    std::vector<cv::Mat> squareImages{};
+    std::vector<cv::Mat> modelInputs{};
+    std::vector<Letterbox> letterboxes{};
+    cv::Mat inputBlob{};
+    std::vector<cv::Mat> outputs{};
+    std::vector<cv::Mat> batchOutputs{};    // 画像毎の出力 (次元数 x 行数)
+    std::vector<cv::Mat> fallbackOutputs{}; // 画像毎に推論した場合の出力の保持先
+    cv::Mat transposedOutput{};
 };
 
 #endif  // INFERENCE_H
@@ -19,6 +19,8 @@
 
 #include "person_counter.h"
 
+#include <algorithm>
+
 #include <spdlog/spdlog.h>
 #include <spdlog/sinks/rotating_file_sink.h>
 
@@ -74,61 +76,237 @@ static cv::Rect getTgtRect(std::vector<OBJPos> &vertices, int cam_width,
     tgtrect.width = rbx - ltx;
     tgtrect.height = rby - lty;
 
+    // 画像の範囲に収める（範囲外・頂点なしの場合は空の矩形になる）
+    tgtrect &= cv::Rect(0, 0, cam_width, cam_height);
+
     return tgtrect;
 }
 
+// 推論結果を元画像の座標系の矩形に変換
+static std::vector<Rect> toRects(const std::vector<Detection> &output,
+                                 const cv::Rect &tgtRect)
+{
+    int detections = output.size();
+    spdlog::trace("Number of detections: {}", detections);
+
+    std::vector<Rect> results;
+    results.reserve(detections);
+
+    for (int i = 0; i < detections; ++i) {
+        const Detection &detection = output[i];
+
+        cv::Rect box = detection.box;
+
+        Rect result;
+        result.x = box.x + tgtRect.x; // Adjust for the cropped region
+        result.y = box.y + tgtRect.y; // Adjust for the cropped region
+        result.width = box.width;
+        result.height = box.height;
+        result.confidence = detection.confidence;
+        // cv::Scalar color = detection.color;
+
+        results.push_back(result);
+    }
+
+    return results;
+}
+
+/**
+ * @brief JPEGデータをデコードします。
+ *
+ * デコード先のバッファはリクエスト間で再利用します。
+ *
+ * @param jpegData      JPEG 形式の画像データの先頭ポインタ
+ * @param jpegSize      JPEG 形式の画像データのバイト数
+ * @param dst           デコード先のバッファ
+ *
+ * @return              デコードされた画像（失敗時は空のMat）
+ */
+cv::Mat PersonCounter::decodeJpeg(const unsigned char *jpegData, size_t jpegSize,
+                                  cv::Mat &dst)
+{
+    if (jpegData == nullptr || jpegSize == 0) {
+        return cv::Mat();
+    }
+
+    // 呼び出し元のメモリをコピーせずにMatとして参照する
+    cv::Mat buf(1, static_cast<int>(jpegSize), CV_8UC1,
+                const_cast<unsigned char *>(jpegData));
+    return cv::imdecode(buf, cv::IMREAD_COLOR, &dst);
+}
+
+/**
+ * @brief デコード済み画像の指定領域から人物の頭部を検出します。
+ *
+ * @param img           デコード済みの画像
+ * @param tgtRect       検出対象領域を内包する矩形
+ *
+ * @return              検出された頭部領域の矩形（Rect型）の vector
+ */
+std::vector<Rect> PersonCounter::detectInRegion(const cv::Mat &img,
+                                                const cv::Rect &tgtRect)
+{
+    if (tgtRect.empty()) {
+        return std::vector<Rect>();
+    }
+
+    // 切り出しはコピーせずROIとして参照する
+    cv::Mat src = img(tgtRect);
+
+    // Inference starts here...
+    return toRects(inf->runInference(src), tgtRect);
+}
+
 /**
  * @brief JPEG画像から人物の頭部を検出します。
  *
- * @param jpegData      JPEG 形式の画像データ（バイナリ形式）
+ * @param jpegData      JPEG 形式の画像データの先頭ポインタ
+ * @param jpegSize      JPEG 形式の画像データのバイト数
  * @param vertices      検出対象領域を示す多角形頂点の座標（OBJPos型の vector）
  * @param thresholds    検出処理に用いる各種しきい値パラメータ（構造体）
  *
  * @return              検出された頭部領域の矩形（Rect型）の vector
  */
-std::vector<Rect> PersonCounter::detectHeads(std::vector<unsigned char> &jpegData,
+std::vector<Rect> PersonCounter::detectHeads(const unsigned char *jpegData,
+                                             size_t jpegSize,
                                              std::vector<OBJPos> &vertices,
                                              Thresholds &thresholds)
 {
-    cv::Mat img = cv::imdecode(jpegData, cv::IMREAD_COLOR);
+    cv::Mat img = decodeJpeg(jpegData, jpegSize, decodedImage);
     if (img.empty()) {
         spdlog::error("Failed to decode JPEG data.");
         return std::vector<Rect>();
     }
 
-    int width = img.cols;
-    int height = img.rows;
-
-    cv::Rect tgtRect = getTgtRect(vertices, width, height);
-
-    cv::Mat src = img(tgtRect).clone();
+    cv::Rect tgtRect = getTgtRect(vertices, img.cols, img.rows);
 
     // set thresholds
     inf->setThresholds(thresholds.confidenceThreshold, thresholds.scoreThreshold,
                        thresholds.nmsThreshold);
 
-    // Inference starts here...
-    std::vector<Detection> output = inf->runInference(src);
+    return detectInRegion(img, tgtRect);
+}
 
-    int detections = output.size();
-    spdlog::trace("Number of detections: {}", detections);
+/**
+ * @brief JPEG画像から複数エリアの人物の頭部を検出します。
+ *
+ * JPEGのデコードは1回だけ行い、各エリアで共有します。
+ * 内包矩形が同じエリアは推論結果を再利用します。
+ *
+ * @param jpegData      JPEG 形式の画像データの先頭ポインタ
+ * @param jpegSize      JPEG 形式の画像データのバイト数
+ * @param verticesList  エリア毎の多角形頂点の座標（OBJPos型の vector）の vector
+ * @param thresholds    検出処理に用いる各種しきい値パラメータ（構造体）
+ *
+ * @return              エリア毎の検出された頭部領域の矩形（Rect型）の vector
+ */
+std::vector<std::vector<Rect>>
+PersonCounter::detectHeadsMulti(const unsigned char *jpegData, size_t jpegSize,
+                                std::vector<std::vector<OBJPos>> &verticesList,
+                                Thresholds &thresholds)
+{
+    std::vector<JpegBuffer> jpegList{{jpegData, jpegSize}};
+    std::vector<std::vector<std::vector<OBJPos>>> verticesLists{verticesList};
+    std::vector<Thresholds> thresholdsList{thresholds};
 
-    std::vector<Rect> results;
+    return detectHeadsBatch(jpegList, verticesLists, thresholdsList)[0];
+}
 
-    for (int i = 0; i < detections; ++i) {
-        Detection detection = output[i];
+/**
+ * @brief 複数のJPEG画像から各エリアの人物の頭部をまとめて検出します。
+ *
+ * 全画像の全エリアの切り出し領域を、上限枚数ずつのバッチ推論にまとめます。
+ * 同じ画像で内包矩形が同じエリアは推論結果を再利用します。
+ *
+ * @param jpegList        JPEG 形式の画像データの vector
+ * @param verticesLists   画像毎・エリア毎の多角形頂点の座標の vector
+ * @param thresholdsList  画像毎の検出処理に用いる各種しきい値パラメータ
+ *
+ * @return                画像毎・エリア毎の検出された頭部領域の矩形の vector
+ */
+std::vector<std::vector<std::vector<Rect>>> PersonCounter::detectHeadsBatch(
+    const std::vector<JpegBuffer> &jpegList,
+    std::vector<std::vector<std::vector<OBJPos>>> &verticesLists,
+    std::vector<Thresholds> &thresholdsList)
+{
+    size_t n = jpegList.size();
+    std::vector<std::vector<std::vector<Rect>>> results(n);
+    if (decodedImages.size() < n) {
+        decodedImages.resize(n);
+    }
 
-        cv::Rect box = detection.box;
+    std::vector<cv::Mat> crops;        // 推論する切り出し領域
+    std::vector<cv::Rect> cropRects;   // 切り出し領域の元画像での矩形
+    std::vector<size_t> cropOwners;    // 切り出し領域の画像番号
+    std::vector<std::vector<size_t>> areaCrops(n); // エリア毎の切り出し領域番号
+    const size_t noCrop = static_cast<size_t>(-1); // 推論対象外のエリア
 
-        Rect result;
-        result.x = box.x + tgtRect.x; // Adjust for the cropped region
-        result.y = box.y + tgtRect.y; // Adjust for the cropped region
-        result.width = box.width;
-        result.height = box.height;
-        result.confidence = detection.confidence;
-        // cv::Scalar color = detection.color;
+    for (size_t i = 0; i < n; ++i) {
+        results[i].resize(verticesLists[i].size());
 
-        results.push_back(result);
+        cv::Mat img =
+            decodeJpeg(jpegList[i].data, jpegList[i].size, decodedImages[i]);
+        if (img.empty()) {
+            spdlog::error("Failed to decode JPEG data.");
+            continue;
+        }
+
+        size_t first = crops.size();
+        for (auto &vertices : verticesLists[i]) {
+            cv::Rect tgtRect = getTgtRect(vertices, img.cols, img.rows);
+            if (tgtRect.empty()) {
+                // 画像内に領域が無いエリアは検出結果なし
+                areaCrops[i].push_back(noCrop);
+                continue;
+            }
+
+            // 同じ画像で同じ領域があれば切り出し領域を共有
+            size_t k = first;
+            while (k < crops.size() && cropRects[k] != tgtRect) {
+                ++k;
+            }
+            if (k == crops.size()) {
+                // 切り出しはコピーせずROIとして参照する
+                crops.push_back(img(tgtRect));
+                cropRects.push_back(tgtRect);
+                cropOwners.push_back(i);
+            }
+            areaCrops[i].push_back(k);
+        }
+    }
+
+    // Inference starts here...
+    // 入力blobが大きくなりすぎないよう、切り出し領域は上限枚数ずつ推論する
+    const size_t batchSize = Inference::maxBatchSize;
+    std::vector<std::vector<Rect>> cropResults(crops.size());
+    std::vector<cv::Mat> batchCrops;
+    for (size_t begin = 0; begin < crops.size(); begin += batchSize) {
+        size_t end = std::min(begin + batchSize, crops.size());
+        batchCrops.assign(crops.begin() + begin, crops.begin() + end);
+        inf->forwardBatch(batchCrops);
+
+        for (size_t k = begin; k < end; ++k) {
+            // set thresholds
+            const Thresholds &thresholds = thresholdsList[cropOwners[k]];
+            inf->setThresholds(thresholds.confidenceThreshold,
+                               thresholds.scoreThreshold,
+                               thresholds.nmsThreshold);
+
+            cropResults[k] = toRects(inf->getDetections(k - begin), cropRects[k]);
+        }
+    }
+
+    for (size_t i = 0; i < n; ++i) {
+        for (size_t j = 0; j < areaCrops[i].size(); ++j) {
+            if (areaCrops[i][j] != noCrop) {
+                results[i][j] = cropResults[areaCrops[i][j]];
+            }
+        }
+    }
+
+    // 大きなバッチで増えたデコード先は上限を超える分を解放する
+    if (decodedImages.size() > batchSize) {
+        decodedImages.resize(batchSize);
     }
 
     return results;
@@ -73,6 +73,13 @@ struct Thresholds
     }
 };
 
+// JPEG画像データの参照（呼び出し元のメモリを指す）
+struct JpegBuffer
+{
+    const unsigned char *data; // 先頭ポインタ
+    size_t size;               // バイト数
+};
+
 class PersonCounter
 {
   public:
@@ -80,11 +87,35 @@ class PersonCounter
     ~PersonCounter();
 
     // 人物頭部検出実行
-    std::vector<Rect> detectHeads(std::vector<unsigned char> &jpegData,
+    std::vector<Rect> detectHeads(const unsigned char *jpegData, size_t jpegSize,
                                   std::vector<OBJPos> &vertices,
                                   Thresholds &thresholds);
+    std::vector<Rect> detectHeads(std::vector<unsigned char> &jpegData,
+                                  std::vector<OBJPos> &vertices,
+                                  Thresholds &thresholds)
+    {
+        return detectHeads(jpegData.data(), jpegData.size(), vertices, thresholds);
+    }
+
+    // 複数エリアの人物頭部検出実行（JPEGのデコードは1回のみ）
+    std::vector<std::vector<Rect>>
+    detectHeadsMulti(const unsigned char *jpegData, size_t jpegSize,
+                     std::vector<std::vector<OBJPos>> &verticesList,
+                     Thresholds &thresholds);
+
+    // 複数リクエストの人物頭部検出をまとめて実行（推論は上限枚数ずつのバッチで行う）
+    std::vector<std::vector<std::vector<Rect>>>
+    detectHeadsBatch(const std::vector<JpegBuffer> &jpegList,
+                     std::vector<std::vector<std::vector<OBJPos>>> &verticesLists,
+                     std::vector<Thresholds> &thresholdsList);
 
   private:
+    cv::Mat decodeJpeg(const unsigned char *jpegData, size_t jpegSize,
+                       cv::Mat &dst);
+    std::vector<Rect> detectInRegion(const cv::Mat &img, const cv::Rect &tgtRect);
+
     std::shared_ptr<Inference> inf; // yolov8 head detection class
+    cv::Mat decodedImage;           // JPEGデコード先（リクエスト間で再利用）
+    std::vector<cv::Mat> decodedImages; // バッチ検出時のJPEGデコード先
 };
 #endif
\ No newline at end of file
@@ -19,10 +19,77 @@
 
 #include "person_counter.h"
 
+#include <cstdio>
+#include <string>
+
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
+#include <pybind11/stl_bind.h>
 namespace py = pybind11;
 
+// 検出結果はPythonのlistに変換せず、C++のvectorのまま保持する
+PYBIND11_MAKE_OPAQUE(std::vector<Rect>);
+// エリアの多角形も一度C++のvectorに変換したものを検出に使い回す
+PYBIND11_MAKE_OPAQUE(std::vector<OBJPos>);
+
+// 検出結果の矩形リストをJSON配列のバイト列に変換
+static py::bytes rectsToJson(const std::vector<Rect> &rects)
+{
+    std::string json;
+    json.reserve(2 + rects.size() * 80);
+    json += '[';
+    char buf[128];
+    for (size_t i = 0; i < rects.size(); ++i) {
+        const Rect &r = rects[i];
+        int len = std::snprintf(buf, sizeof(buf),
+                                "%s{\"x\":%d,\"y\":%d,\"width\":%d,\"height\":%d,"
+                                "\"confidence\":%.9g}",
+                                i == 0 ? "" : ",", r.x, r.y, r.width, r.height,
+                                r.confidence);
+        json.append(buf, len);
+    }
+    json += ']';
+    return py::bytes(json);
+}
+
+// リクエストの vertexs 配列（{"x": int, "y": int} の list）から頂点リストを生成
+// 検証と変換をC++のループで1回の呼び出しとして行う
+static std::vector<OBJPos> objPosListFromVertexs(const py::list &vertexs)
+{
+    // キーは呼び出し毎に生成する（静的なPythonオブジェクトはインタプリタ終了後に破棄されるため）
+    const py::str keyX("x");
+    const py::str keyY("y");
+
+    std::vector<OBJPos> vertices;
+    vertices.reserve(vertexs.size());
+    for (const py::handle &vertex : vertexs) {
+        if (!py::isinstance<py::dict>(vertex)) {
+            throw py::type_error("Each vertex must be an object");
+        }
+        auto dict = py::reinterpret_borrow<py::dict>(vertex);
+        if (!dict.contains(keyX) || !dict.contains(keyY)) {
+            throw py::value_error("Each vertex must have x and y coordinates");
+        }
+        try {
+            vertices.emplace_back(dict[keyX].cast<int>(), dict[keyY].cast<int>());
+        }
+        catch (const py::cast_error &) {
+            throw py::type_error("Vertex x and y must be integers");
+        }
+    }
+    return vertices;
+}
+
+// bytes / bytearray / memoryview などのbufferをコピーせずに参照する
+static py::buffer_info requestJpegBuffer(const py::buffer &jpegData)
+{
+    py::buffer_info info = jpegData.request();
+    if (info.ndim != 1 || info.strides[0] != info.itemsize) {
+        throw py::value_error("jpegData must be a contiguous 1-D buffer");
+    }
+    return info;
+}
+
 PyMODINIT_FUNC PyInit_PersonCounterModule()
 {
     py::module m("PersonCounterModule", "Person counter plugin");
@@ -48,6 +115,10 @@ PyMODINIT_FUNC PyInit_PersonCounterModule()
                 return result;
             },
             "Convert Rect to dictionary");
+    // Define the list of Rect (kept as std::vector<Rect>)
+    py::bind_vector<std::vector<Rect>>(m, "RectList")
+        .def("to_json", &rectsToJson,
+             "Serialize all Rects to a JSON array in a single call");
     // Define OBJPos and Thresholds classes
     py::class_<OBJPos>(m, "OBJPos")
         .def(py::init<>())
@@ -63,6 +134,12 @@ PyMODINIT_FUNC PyInit_PersonCounterModule()
                 return result;
             },
             "Convert OBJPos to dictionary");
+    // Define the list of OBJPos (kept as std::vector<OBJPos>)
+    py::bind_vector<std::vector<OBJPos>>(m, "OBJPosList")
+        .def_static("from_vertexs", &objPosListFromVertexs, py::arg("vertexs"),
+                    "Create an OBJPosList from a list of {\"x\": int, \"y\": int} "
+                    "objects");
+    py::implicitly_convertible<py::list, std::vector<OBJPos>>();
     py::class_<Thresholds>(m, "Thresholds")
         .def(py::init<float, float, float>(), py::arg("confidenceThreshold"),
              py::arg("scoreThreshold"), py::arg("nmsThreshold"))
@@ -82,9 +159,65 @@ PyMODINIT_FUNC PyInit_PersonCounterModule()
 
     py::class_<PersonCounter>(m, "PersonCounter")
         .def(py::init<>())
-        .def("detectHeads", &PersonCounter::detectHeads, py::arg("jpegData"),
-             py::arg("vertices"), py::arg("thresholds") = Thresholds(),
-             "Detect heads in the given JPEG data using the specified vertices and "
-             "thresholds.");
+        .def(
+            "detectHeads",
+            [](PersonCounter &self, const py::buffer &jpegData,
+               std::vector<OBJPos> &vertices, Thresholds &thresholds) {
+                py::buffer_info info = requestJpegBuffer(jpegData);
+                py::gil_scoped_release release;
+                return self.detectHeads(
+                    static_cast<const unsigned char *>(info.ptr),
+                    static_cast<size_t>(info.size * info.itemsize), vertices,
+                    thresholds);
+            },
+            py::arg("jpegData"), py::arg("vertices"),
+            py::arg("thresholds") = Thresholds(),
+            "Detect heads in the given JPEG data using the specified vertices and "
+            "thresholds.")
+        .def(
+            "detectHeadsMulti",
+            [](PersonCounter &self, const py::buffer &jpegData,
+               std::vector<std::vector<OBJPos>> &verticesList,
+               Thresholds &thresholds) {
+                py::buffer_info info = requestJpegBuffer(jpegData);
+                py::gil_scoped_release release;
+                return self.detectHeadsMulti(
+                    static_cast<const unsigned char *>(info.ptr),
+                    static_cast<size_t>(info.size * info.itemsize), verticesList,
+                    thresholds);
+            },
+            py::arg("jpegData"), py::arg("verticesList"),
+            py::arg("thresholds") = Thresholds(),
+            "Detect heads for each area in the given JPEG data, decoding the "
+            "image only once.")
+        .def(
+            "detectHeadsBatch",
+            [](PersonCounter &self, const std::vector<py::buffer> &jpegList,
+               std::vector<std::vector<std::vector<OBJPos>>> &verticesLists,
+               std::vector<Thresholds> &thresholdsList) {
+                if (verticesLists.size() != jpegList.size()
+                    || thresholdsList.size() != jpegList.size()) {
+                    throw py::value_error("jpegList, verticesLists and "
+                                          "thresholdsList must have the same "
+                                          "length");
+                }
+                std::vector<py::buffer_info> infos;
+                std::vector<JpegBuffer> buffers;
+                infos.reserve(jpegList.size());
+                buffers.reserve(jpegList.size());
+                for (const py::buffer &jpegData : jpegList) {
+                    infos.push_back(requestJpegBuffer(jpegData));
+                    const py::buffer_info &info = infos.back();
+                    buffers.push_back(
+                        {static_cast<const unsigned char *>(info.ptr),
+                         static_cast<size_t>(info.size * info.itemsize)});
+                }
+                py::gil_scoped_release release;
+                return self.detectHeadsBatch(buffers, verticesLists,
+                                             thresholdsList);
+            },
+            py::arg("jpegList"), py::arg("verticesLists"), py::arg("thresholdsList"),
+            "Detect heads for several JPEG images at once, running a single "
+            "batched inference over all of their areas.");
     return m.ptr();
 }
\ No newline at end of file